@@ -2,7 +2,6 @@ import asyncio
 import re
 import signal
 import sys
-from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from typing import Dict, List, Optional
 
@@ -11,6 +10,7 @@ import aiohttp
 from aiohttp_proxy import ProxyConnector
 from rich import print as rprint
 from rich.progress import BarColumn, Live, Progress, TaskID, TextColumn
+from telethon.errors import FloodWaitError, RPCError
 from telethon.tl.types import Message
 
 from src.cache_manager import CacheManager
@@ -27,8 +27,6 @@ from src.utils import (
     setup_logging,
 )
 
-process_executor: Optional[ProcessPoolExecutor] = None
-
 def handle_sigint(signum, frame):
     """
     Handle SIGINT (Ctrl+C) signal by printing a message and exiting the program.
@@ -45,6 +43,27 @@ def handle_sigint(signum, frame):
 
 signal.signal(signal.SIGINT, handle_sigint)
 
+def get_media_size(msg) -> int:
+    """
+    Return the size in bytes of a message's media, or 0 when unknown.
+
+    Args:
+        msg: Telegram message object.
+
+    Returns:
+        The document size or the largest photo size, in bytes.
+    """
+    media = getattr(msg, "media", None)
+    if not media:
+        return 0
+    document = getattr(media, "document", None)
+    if document is not None and hasattr(document, "size"):
+        return document.size or 0
+    photo = getattr(media, "photo", None)
+    if photo is not None and hasattr(photo, "sizes"):
+        return max((s.size for s in photo.sizes if getattr(s, "size", None)), default=0)
+    return 0
+
 async def process_message_group(
     messages: List[Message],
     entity_id_str: str,
@@ -94,10 +113,9 @@ async def process_message_group(
     try:
         entity_id = int(entity_id_str)
         media_paths = []
-        semaphore = asyncio.Semaphore(getattr(config, "download_workers", int(getattr(config, "workers", 8) * 1.5)))
         comments = []
 
-        if getattr(config, "export_comments", False):
+        if config.export_comments:
             telegram_client = telegram_manager.get_client() if hasattr(telegram_manager, "get_client") else None
             if telegram_client is not None:
                 channel_id = getattr(first_message, "chat_id", None)
@@ -113,32 +131,24 @@ async def process_message_group(
                         else:
                             rprint(f"[yellow]Комментариев для поста {first_message.id} получить не удалось: {e}[/yellow]")
 
-        media_messages = []
+        media_messages_by_id = {}
         for msg in messages:
             if hasattr(msg, "media") and msg.media:
-                media_messages.append(msg)
+                media_messages_by_id.setdefault(msg.id, msg)
 
-        if getattr(config, "export_comments", False):
+        if config.export_comments:
             for comment in comments:
                 if hasattr(comment, "media") and comment.media:
-                    media_messages.append(comment)
+                    media_messages_by_id.setdefault(comment.id, comment)
 
-        unique_media_messages = list({msg.id: msg for msg in media_messages}.values())
+        # Dispatch the biggest files first (longest-processing-time scheduling),
+        # so a large video is not left running alone after the small items finish.
+        unique_media_messages = sorted(media_messages_by_id.values(), key=get_media_size, reverse=True)
 
-        total_media_size = 0
-        for msg in unique_media_messages:
-            size = 0
-            if hasattr(msg, "media") and msg.media:
-                if hasattr(msg.media, 'document') and hasattr(msg.media.document, 'size'):
-                    size = msg.media.document.size
-                elif hasattr(msg.media, 'photo') and hasattr(msg.media.photo, 'sizes'):
-                    photo_sizes = [s.size for s in msg.media.photo.sizes if hasattr(s, 'size') and s.size]
-                    if photo_sizes:
-                        size = max(photo_sizes)
-            total_media_size += size if size else 0
+        total_media_size = sum(get_media_size(msg) for msg in unique_media_messages)
 
         text_comment_count = 0
-        if getattr(config, "export_comments", False):
+        if config.export_comments:
             text_comment_count = sum(1 for c in comments if not (hasattr(c, "media") and c.media))
 
         task_total = total_media_size + text_comment_count + 1
@@ -154,34 +164,32 @@ async def process_message_group(
             })
 
         async def download_media_task(msg):
-            async with semaphore:
-                for attempt in range(3):
-                    try:
-                        result = await media_processor.download_and_optimize_media(
-                            msg, entity_id, entity_media_path, task_id=post_task_id, progress_queue=progress_queue
-                        )
-                        return result
-                    except Exception as e:
-                        rprint(f"[red][{entity_id_str}] Ошибка при скачивании медиа (попытка {attempt+1}/3): {e}[/red]")
-                        await asyncio.sleep(1)
-
-                rprint(f"[red][{entity_id_str}] Не удалось скачать медиа после 3 попыток для сообщения {msg.id}[/red]")
-
-                size_on_fail = 0
-                if hasattr(msg, "media") and msg.media:
-                    if hasattr(msg.media, 'document') and hasattr(msg.media.document, 'size'):
-                        size_on_fail = msg.media.document.size or 0
-                    elif hasattr(msg.media, 'photo') and hasattr(msg.media.photo, 'sizes'):
-                        photo_sizes = [s.size for s in msg.media.photo.sizes if hasattr(s, 'size') and s.size]
-                        if photo_sizes:
-                            size_on_fail = max(photo_sizes)
-
-                if progress_queue is not None and post_task_id is not None and size_on_fail > 0:
-                    await progress_queue.put({
-                        "type": "update", "task_id": post_task_id, "data": {"advance": size_on_fail}
-                    })
+            for attempt in range(3):
+                try:
+                    result = await media_processor.download_and_optimize_media(
+                        msg, entity_id, entity_media_path, task_id=post_task_id, progress_queue=progress_queue
+                    )
+                    return result
+                except FloodWaitError as e:
+                    rprint(f"[yellow][{entity_id_str}] FloodWait при скачивании медиа: ждём {e.seconds} сек...[/yellow]")
+                    await asyncio.sleep(e.seconds)
+                except RPCError as e:
+                    rprint(f"[yellow][{entity_id_str}] Ошибка Telegram API при скачивании медиа (попытка {attempt+1}/3): {e}[/yellow]")
+                    await asyncio.sleep(1)
+                except Exception as e:
+                    rprint(f"[red][{entity_id_str}] Ошибка при скачивании медиа (попытка {attempt+1}/3): {e}[/red]")
+                    await asyncio.sleep(1)
+
+            rprint(f"[red][{entity_id_str}] Не удалось скачать медиа после 3 попыток для сообщения {msg.id}[/red]")
+
+            size_on_fail = get_media_size(msg)
+
+            if progress_queue is not None and post_task_id is not None and size_on_fail > 0:
+                await progress_queue.put({
+                    "type": "update", "task_id": post_task_id, "data": {"advance": size_on_fail}
+                })
 
-                return None
+            return None
 
         results = []
         try:
@@ -207,7 +215,7 @@ async def process_message_group(
             note_path = await note_generator.create_note(
                 first_message, media_paths, entity_id, entity_export_path,
                 client=telegram_manager.get_client() if hasattr(telegram_manager, "get_client") else None,
-                export_comments=getattr(config, "export_comments", False),
+                export_comments=config.export_comments,
                 entity_media_path=entity_media_path
             )
         except Exception as e:
@@ -254,21 +262,22 @@ async def process_message_group(
                 await note_generator.write_note_content(note_path, modified_content)
 
         note_filename = note_path.name
-        reply_to_id = getattr(first_message.reply_to, 'reply_to_msg_id', None)
-
-        for message in messages:
-            channel_id = getattr(message.peer_id, 'channel_id', None)
-            telegram_url = f"https://t.me/c/{channel_id}/{message.id}" if channel_id else None
+        first_message_id = first_message.id
+        reply_to_id = getattr(getattr(first_message, "reply_to", None), "reply_to_msg_id", None)
 
-            if cache_manager is not None:
-                await cache_manager.add_processed_message_async(
-                    message_id=message.id,
-                    note_filename=note_filename,
-                    reply_to_id=reply_to_id if message.id == first_message.id else None,
-                    entity_id=entity_id_str,
-                    title=(message.text or "").split('\n', 1)[0].strip(),
-                    telegram_url=telegram_url
-                )
+        if cache_manager is not None:
+            cache_entries = []
+            for message in messages:
+                channel_id = getattr(message.peer_id, 'channel_id', None)
+                telegram_url = f"https://t.me/c/{channel_id}/{message.id}" if channel_id else None
+                cache_entries.append({
+                    "message_id": message.id,
+                    "note_filename": note_filename,
+                    "reply_to_id": reply_to_id if message.id == first_message_id else None,
+                    "title": (message.text or "").split('\n', 1)[0].strip(),
+                    "telegram_url": telegram_url
+                })
+            await cache_manager.add_processed_messages_bulk_async(entity_id_str, cache_entries)
 
         if progress_queue is not None and post_task_id is not None:
             await progress_queue.put({"type": "update", "task_id": post_task_id, "data": {"advance": 1, "description": f"Пост {first_message.id}: Готово"}})
@@ -320,13 +329,14 @@ async def export_single_target(
 
         ensure_dir_exists(entity_export_path)
         ensure_dir_exists(entity_media_path)
+        await media_processor.prepare(entity_media_path)
 
-        last_processed_id = cache_manager.get_last_processed_message_id(entity_id_str) if (getattr(config, "only_new", False) and cache_manager is not None) else None
+        last_processed_id = cache_manager.get_last_processed_message_id(entity_id_str) if (config.only_new and cache_manager is not None) else None
         if last_processed_id:
             rprint(f"[bold cyan][{target.name}] Incremental mode. Starting after message ID: {last_processed_id}[/bold cyan]")
 
         grouped_messages = {}
-        semaphore = asyncio.Semaphore(getattr(config, "download_workers", int(getattr(config, "workers", 8) * 1.5)))
+        semaphore = asyncio.Semaphore(config.workers)
         active_tasks = set()
         successful_count = 0
         processed_count = 0
@@ -348,38 +358,43 @@ async def export_single_target(
             if not messages:
                 return
 
-            async with semaphore:
-                task = asyncio.create_task(
-                    process_message_group(
-                        messages, entity_id_str, entity_export_path, entity_media_path,
-                        media_processor, note_generator, cache_manager, config,
-                        http_session, telegram_manager,
-                        progress_queue=progress_queue,
-                        post_task_id=post_task_id
+            async def _guarded():
+                async with semaphore:
+                    return await process_message_group(
+                        messages=messages, entity_id_str=entity_id_str, target_name=target.name,
+                        entity_export_path=entity_export_path, entity_media_path=entity_media_path,
+                        last_processed_id=last_processed_id, config=config,
+                        telegram_manager=telegram_manager, cache_manager=cache_manager,
+                        media_processor=media_processor, note_generator=note_generator,
+                        http_session=http_session, export_target=target,
+                        progress_queue=progress_queue, post_task_id=post_task_id
                     )
-                )
-                active_tasks.add(task)
 
-                def task_done_callback(fut: asyncio.Task):
-                    nonlocal successful_count
-                    if fut.exception():
-                        logger.error(f"Task for group {group_id} failed: {fut.exception()}")
-                    elif fut.result() is not None:
-                        successful_count += 1
-                    active_tasks.discard(fut)
+            task = asyncio.create_task(_guarded())
+            active_tasks.add(task)
 
-                task.add_done_callback(task_done_callback)
+            def task_done_callback(fut: asyncio.Task):
+                nonlocal successful_count
+                if fut.exception():
+                    logger.error(f"Task for group {group_id} failed: {fut.exception()}")
+                elif fut.result() is not None:
+                    successful_count += 1
+                active_tasks.discard(fut)
+
+            task.add_done_callback(task_done_callback)
 
         try:
             if getattr(target, "type", None) == "single_post":
                 messages_to_process = getattr(config, "_single_post_messages_to_process", None)
                 if messages_to_process:
                     await process_message_group(
-                        messages_to_process, entity_id_str, entity_export_path, entity_media_path,
-                        media_processor, note_generator, cache_manager, config,
-                        http_session, telegram_manager,
-                        progress_queue=progress_queue,
-                        post_task_id=post_task_id
+                        messages=messages_to_process, entity_id_str=entity_id_str, target_name=target.name,
+                        entity_export_path=entity_export_path, entity_media_path=entity_media_path,
+                        last_processed_id=last_processed_id, config=config,
+                        telegram_manager=telegram_manager, cache_manager=cache_manager,
+                        media_processor=media_processor, note_generator=note_generator,
+                        http_session=http_session, export_target=target,
+                        progress_queue=progress_queue, post_task_id=post_task_id
                     )
                     return
                 else:
@@ -394,36 +409,115 @@ async def export_single_target(
                 else:
                     logger.error(f"[{target.name}] Message with ID {target.message_id} not found.")
             else:
-                async for message in telegram_manager.fetch_messages(entity=entity, min_id=last_processed_id):
-                    processed_count += 1
-                    current_time = asyncio.get_event_loop().time()
-
-                    if current_time - last_message_time > GROUP_TIMEOUT:
-                        for gid in list(grouped_messages.keys()):
-                            await _process_group(gid)
+                worker_count = config.download_workers
+                prefetch_depth = max(worker_count * 2, config.message_batch_size)
+                group_queue: asyncio.Queue = asyncio.Queue(maxsize=prefetch_depth)
+
+                pending_group_min_ids = set()
+                last_fetched_id = 0
+
+                async def _enqueue_group(group_id: int):
+                    messages = grouped_messages.pop(group_id, [])
+                    if messages:
+                        pending_group_min_ids.add(min(m.id for m in messages))
+                        await group_queue.put(messages)
+
+                def _resume_floor() -> int:
+                    # Safe resume point: everything below it is either
+                    # processed or will be re-fetched. Groups still buffered
+                    # in grouped_messages count the same as pending ones —
+                    # neither has produced a note yet.
+                    unfinished_min_ids = set(pending_group_min_ids)
+                    for buffered in grouped_messages.values():
+                        unfinished_min_ids.add(min(m.id for m in buffered))
+                    if unfinished_min_ids:
+                        return min(unfinished_min_ids) - 1
+                    return last_fetched_id
+
+                processed_ids = (
+                    cache_manager.get_processed_message_ids(entity_id_str)
+                    if (config.only_new and cache_manager is not None) else ()
+                )
 
-                    group_id = getattr(message, 'grouped_id', None)
-                    if group_id:
-                        grouped_messages.setdefault(group_id, []).append(message)
-                    else:
-                        if grouped_messages:
-                            for gid in list(grouped_messages.keys()):
-                                await _process_group(gid)
-                        grouped_messages[message.id] = [message]
-                        await _process_group(message.id)
-                    last_message_time = current_time
+                async def producer():
+                    nonlocal processed_count, last_message_time, last_fetched_id
+                    try:
+                        async for message in telegram_manager.fetch_messages(entity=entity, min_id=last_processed_id):
+                            if processed_ids and str(message.id) in processed_ids:
+                                last_fetched_id = message.id
+                                continue
+                            processed_count += 1
+                            current_time = asyncio.get_event_loop().time()
+
+                            if current_time - last_message_time > GROUP_TIMEOUT:
+                                for gid in list(grouped_messages.keys()):
+                                    await _enqueue_group(gid)
+
+                            group_id = getattr(message, 'grouped_id', None)
+                            if group_id:
+                                grouped_messages.setdefault(group_id, []).append(message)
+                            else:
+                                if grouped_messages:
+                                    for gid in list(grouped_messages.keys()):
+                                        await _enqueue_group(gid)
+                                grouped_messages[message.id] = [message]
+                                await _enqueue_group(message.id)
+                            last_message_time = current_time
+                            # Only advance the floor once the message is
+                            # buffered or pending; the awaits above yield to
+                            # workers that read last_fetched_id.
+                            last_fetched_id = message.id
+
+                            if processed_count % config.cache_save_interval == 0 and cache_manager is not None:
+                                await cache_manager.schedule_background_save()
 
-                    if processed_count % getattr(config, "cache_save_interval", 10) == 0 and cache_manager is not None:
-                        await cache_manager.schedule_background_save()
+                        for gid in list(grouped_messages.keys()):
+                            await _enqueue_group(gid)
+                    finally:
+                        # Signal workers to stop by putting None for each worker
+                        for _ in range(worker_count):
+                            await group_queue.put(None)
 
-                for gid in list(grouped_messages.keys()):
-                    await _process_group(gid)
+                async def group_worker():
+                    nonlocal successful_count
+                    while True:
+                        messages = await group_queue.get()
+                        if messages is None:
+                            group_queue.task_done()
+                            break
+                        try:
+                            result = await process_message_group(
+                                messages=messages, entity_id_str=entity_id_str, target_name=target.name,
+                                entity_export_path=entity_export_path, entity_media_path=entity_media_path,
+                                last_processed_id=last_processed_id, config=config,
+                                telegram_manager=telegram_manager, cache_manager=cache_manager,
+                                media_processor=media_processor, note_generator=note_generator,
+                                http_session=http_session, export_target=target,
+                                progress_queue=progress_queue, post_task_id=post_task_id
+                            )
+                            if result is not None:
+                                successful_count += 1
+                                pending_group_min_ids.discard(min(m.id for m in messages))
+                                if cache_manager is not None:
+                                    resume_id = _resume_floor()
+                                    if resume_id > 0:
+                                        await cache_manager.set_resume_point(entity_id_str, resume_id)
+                        except Exception as e:
+                            logger.error(f"Worker failed for message group: {e}")
+                        finally:
+                            group_queue.task_done()
+
+                await asyncio.gather(producer(), *[group_worker() for _ in range(worker_count)])
+
+                if processed_count == 0 and last_processed_id:
+                    rprint(f"[green][{target.name}] Уже актуально: новых сообщений после ID {last_processed_id} нет.[/green]")
+                    return
 
             if active_tasks:
                 await asyncio.gather(*active_tasks)
 
         except Exception as e:
-            logger.error(f"[{target.name}] Error during message processing loop: {e}", exc_info=(getattr(config, "log_level", "INFO") == 'DEBUG'))
+            logger.error(f"[{target.name}] Error during message processing loop: {e}", exc_info=(config.log_level == 'DEBUG'))
     finally:
         if not (getattr(target, "type", None) == "single_post" or getattr(target, "message_id", None) is not None):
             if cache_manager is not None:
@@ -431,35 +525,39 @@ async def export_single_target(
 
 
 async def progress_manager(progress_bar: Progress, queue: asyncio.Queue, task_map: Dict[any, TaskID]):
-    """Manages updates to a rich.Progress object from a queue, batching updates to avoid lock contention."""
+    """
+    Manages updates to a rich.Progress object from a queue, batching updates to avoid lock contention.
+
+    The consumer blocks on the queue instead of polling with a timeout; a
+    companion task flushes batched advances at ~10fps so the loop never wakes
+    up just to find the queue empty.
+    """
     advances = {}  # {rich_task_id: total_advance}
     update_interval = 0.1  # 100ms, i.e., 10fps
 
-    while True:
-        pending_commands = []
-        try:
-            # Wait for the first item, with a timeout.
-            cmd = await asyncio.wait_for(queue.get(), timeout=update_interval)
-            pending_commands.append(cmd)
-
-            # Drain any other items that are already in the queue.
-            while not queue.empty():
-                pending_commands.append(queue.get_nowait())
-
-        except (asyncio.TimeoutError, asyncio.QueueEmpty):
-            # This is our chance to apply updates.
-            pass
-        except Exception as e:
-            logger.error(f"Progress manager error: {e}", exc_info=True)
-
-        for cmd in pending_commands:
+    def flush_advances():
+        for task, total_advance in advances.items():
+            if total_advance > 0:
+                try:
+                    progress_bar.update(task, advance=total_advance)
+                except Exception:
+                    # Task might have been removed in the same batch.
+                    pass
+        advances.clear()
+
+    async def periodic_flush():
+        while True:
+            await asyncio.sleep(update_interval)
+            if advances:
+                flush_advances()
+
+    flusher = asyncio.create_task(periodic_flush())
+    try:
+        while True:
+            cmd = await queue.get()
             if cmd is None:
                 # Apply any final updates and exit.
-                if advances:
-                    for task, total_advance in advances.items():
-                        if total_advance > 0:
-                            progress_bar.update(task, advance=total_advance)
-                    advances.clear()
+                flush_advances()
                 queue.task_done()
                 return
 
@@ -487,22 +585,14 @@ async def progress_manager(progress_bar: Progress, queue: asyncio.Queue, task_ma
                 elif cmd_type == "remove":
                     if task_id in task_map:
                         target_rich_task_id = task_map.pop(task_id)
+                        advances.pop(target_rich_task_id, None)
                         progress_bar.remove_task(target_rich_task_id)
             except Exception as e:
                 logger.error(f"Error processing progress command: {cmd}, error: {e}", exc_info=True)
             finally:
                 queue.task_done()
-
-        # Apply all batched updates for this interval.
-        if advances:
-            for task, total_advance in advances.items():
-                if total_advance > 0:
-                    try:
-                        progress_bar.update(task, advance=total_advance)
-                    except Exception:
-                        # Task might have been removed in the same batch.
-                        pass
-            advances.clear()
+    finally:
+        flusher.cancel()
 
 
 async def run_export(config: Config):
@@ -516,7 +606,6 @@ async def run_export(config: Config):
     Returns:
         None
     """
-    global process_executor
     telegram_manager = None
     try:
         telegram_manager = TelegramManager(config)
@@ -528,7 +617,7 @@ async def run_export(config: Config):
         reply_linker = None
         cache_manager = None
 
-        if getattr(config, "interactive_mode", False):
+        if config.interactive_mode:
             await interactive_config_update(config)
             while True:
                 config.export_targets.clear()
@@ -538,7 +627,7 @@ async def run_export(config: Config):
                     continue
 
                 connector = None
-                if getattr(config, "proxy_type", None) and getattr(config, "proxy_addr", None) and getattr(config, "proxy_port", None):
+                if config.proxy_type and config.proxy_addr and config.proxy_port:
                     proxy_url = f"{config.proxy_type.lower()}://{config.proxy_addr}:{config.proxy_port}"
                     connector = ProxyConnector.from_url(proxy_url)
 
@@ -561,11 +650,7 @@ async def run_export(config: Config):
                         rprint(f"[bold red]Could not resolve entity for target ID: {target.id}. Skipping.[/bold red]")
                         continue
 
-                    try:
-                        total_count = await telegram_manager.client.get_messages(entity, limit=0)
-                        total_posts = total_count.total
-                    except Exception:
-                        total_posts = None
+                    total_posts = await telegram_manager.count_messages(entity)
                     rprint("[cyan]***Export started***[/cyan]")
                     rprint("[magenta]***Downloading posts/media***[/magenta]")
 
@@ -622,7 +707,7 @@ async def run_export(config: Config):
 
                     # --- Full Channel Export Orchestrator ---
                     async def orchestrator():
-                        message_queue = asyncio.Queue(maxsize=config.workers * 2)
+                        message_queue = asyncio.Queue(maxsize=max(config.workers * 2, config.message_batch_size))
                         progress_queue = asyncio.Queue()
                         task_map = {}
 
@@ -746,12 +831,17 @@ async def run_export(config: Config):
                 return
 
             connector = None
-            if getattr(config, "proxy_type", None) and getattr(config, "proxy_addr", None) and getattr(config, "proxy_port", None):
+            if config.proxy_type and config.proxy_addr and config.proxy_port:
                 proxy_url = f"{config.proxy_type.lower()}://{config.proxy_addr}:{config.proxy_port}"
                 connector = ProxyConnector.from_url(proxy_url)
 
             async with aiohttp.ClientSession(headers=AIOHTTP_HEADERS, connector=connector) as http_session:
                 rprint("[cyan]***Export***[/cyan]")
+                # Pre-warm the entity cache so the per-target loop below
+                # resolves from memory instead of issuing one RPC each.
+                await telegram_manager.resolve_entities(
+                    [target.id for target in config.export_targets]
+                )
                 for target in config.export_targets:
                     if getattr(target, "type", None) == "single_post" or getattr(target, "message_id", None) is not None:
                         local_cache_manager = None
@@ -812,8 +902,6 @@ async def run_export(config: Config):
     finally:
         if telegram_manager and getattr(telegram_manager, "client_connected", False):
             await telegram_manager.disconnect()
-        if process_executor:
-            process_executor.shutdown(wait=False)
 
 def prompt_int(prompt, default):
     """
@@ -944,6 +1032,12 @@ async def main():
 if __name__ == "__main__":
     if sys.platform == "win32":
         asyncio.set_event_loop_policy(asyncio.WindowsProactorEventLoopPolicy())
+    else:
+        try:
+            import uvloop
+            uvloop.install()
+        except ImportError:
+            pass
     try:
         asyncio.run(main())
     except KeyboardInterrupt:
@@ -1,12 +1,18 @@
 import asyncio
 import json
 import os
+import time
 from pathlib import Path
-from typing import Any, Callable, Dict, Optional, Union
+from typing import Any, Callable, Dict, List, Optional, Union
 
 import aiofiles
 import ujson
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 from src.utils import logger
 
 
@@ -26,6 +32,11 @@ class CacheManager:
         self._lock = asyncio.Lock()
         self._save_task: Optional[asyncio.Task] = None
         self._dirty = False
+        self._pending_changes = 0
+        self._last_save_time = time.monotonic()
+        self._save_threshold = 200
+        self._save_interval_s = 30.0
+        self._processed_ids: Dict[str, set] = {}
 
     async def load_cache(self):
         """
@@ -47,7 +58,7 @@ class CacheManager:
                     return
 
                 try:
-                    loaded_data = ujson.loads(content)
+                    loaded_data = orjson.loads(content) if orjson is not None else ujson.loads(content)
                 except Exception as e:
                     logger.error(f"Cache file has invalid format or could not be parsed: {e}. Starting fresh.")
                     return
@@ -63,6 +74,7 @@ class CacheManager:
                     data.setdefault("last_id", None)
                     data.setdefault("title", "Unknown")
                     data.setdefault("type", "unknown")
+                    self._processed_ids[entity_id] = set(data["processed_messages"])
 
                 logger.info(f"Cache loaded: {len(self.cache['entities'])} entities.")
 
@@ -102,18 +114,24 @@ class CacheManager:
             if not self._dirty:
                 return
             try:
-                cache_json = ujson.dumps(self.cache, indent=2, ensure_ascii=False)
+                if orjson is not None:
+                    cache_bytes = orjson.dumps(self.cache, option=orjson.OPT_INDENT_2)
+                else:
+                    cache_bytes = ujson.dumps(self.cache, indent=2, ensure_ascii=False).encode('utf-8')
                 temp_path = self.cache_path.with_suffix('.tmp')
-                async with aiofiles.open(temp_path, mode='w', encoding='utf-8') as f:
-                    await f.write(cache_json)
+                async with aiofiles.open(temp_path, mode='wb') as f:
+                    await f.write(cache_bytes)
                 os.replace(temp_path, self.cache_path)
                 self._dirty = False
+                self._pending_changes = 0
+                self._last_save_time = time.monotonic()
             except Exception:
                 pass
 
     async def schedule_background_save(self):
         """
-        Schedule a background save of the cache if there are changes.
+        Schedule a background save of the cache if enough changes accumulated
+        or enough time passed since the last save.
 
         Args:
             None
@@ -123,8 +141,8 @@ class CacheManager:
         """
         if not self._dirty or (self._save_task and not self._save_task.done()):
             return
-        await asyncio.sleep(0.1)
-        if not self._dirty:
+        if (self._pending_changes < self._save_threshold
+                and time.monotonic() - self._last_save_time < self._save_interval_s):
             return
         self._save_task = asyncio.create_task(self.save_cache())
 
@@ -146,6 +164,7 @@ class CacheManager:
             result = operation(entity_data)
             if modify:
                 self._dirty = True
+                self._pending_changes += 1
             return result
 
     async def is_processed(self, message_id: int, entity_id: Union[str, int]) -> bool:
@@ -159,10 +178,20 @@ class CacheManager:
         Returns:
             bool: True if processed, False otherwise.
         """
-        msg_id_str = str(message_id)
-        def check(data):
-            return msg_id_str in data.get("processed_messages", {})
-        return await self._with_entity_data(entity_id, check) or False
+        processed = self._processed_ids.get(str(entity_id))
+        return processed is not None and str(message_id) in processed
+
+    def get_processed_message_ids(self, entity_id: Union[str, int]) -> set:
+        """
+        Get the set of processed message ID strings for a given entity.
+
+        Args:
+            entity_id (Union[str, int]): The entity identifier.
+
+        Returns:
+            set: The processed message IDs as strings (empty if none).
+        """
+        return self._processed_ids.get(str(entity_id), set())
 
     async def add_processed_message_async(
         self, message_id: int, note_filename: str, reply_to_id: Optional[int],
@@ -195,6 +224,43 @@ class CacheManager:
             if current_last_id is None or message_id > current_last_id:
                 data["last_id"] = message_id
         await self._with_entity_data(entity_id, update, modify=True)
+        self._processed_ids.setdefault(str(entity_id), set()).add(msg_id_str)
+        await self.schedule_background_save()
+
+    async def add_processed_messages_bulk_async(self, entity_id: Union[str, int], entries: List[Dict[str, Any]]):
+        """
+        Add several processed messages to the cache for a given entity in one pass.
+
+        Takes the cache lock once for the whole batch instead of once per
+        message, which matters when a message group finishes many notes at once.
+
+        Args:
+            entity_id (Union[str, int]): The entity identifier.
+            entries (List[Dict[str, Any]]): Dicts with the same keys as
+                add_processed_message_async: message_id, note_filename,
+                reply_to_id, title, telegram_url.
+
+        Returns:
+            None
+        """
+        if not entries:
+            return
+        def update(data):
+            for entry in entries:
+                message_id = entry["message_id"]
+                data["processed_messages"][str(message_id)] = {
+                    "filename": entry["note_filename"],
+                    "reply_to": entry.get("reply_to_id"),
+                    "title": entry.get("title"),
+                    "telegram_url": entry.get("telegram_url"),
+                    "media_files": []
+                }
+                current_last_id = data.get("last_id")
+                if current_last_id is None or message_id > current_last_id:
+                    data["last_id"] = message_id
+        await self._with_entity_data(entity_id, update, modify=True)
+        id_set = self._processed_ids.setdefault(str(entity_id), set())
+        id_set.update(str(entry["message_id"]) for entry in entries)
         await self.schedule_background_save()
 
     async def update_entity_info_async(self, entity_id: Union[str, int], title: str, entity_type: str):
@@ -287,4 +353,30 @@ class CacheManager:
             Optional[int]: The last processed message ID, or None if not found.
         """
         entity_data = self.cache.get("entities", {}).get(str(entity_id))
-        return entity_data.get("last_id") if entity_data else None
+        if not entity_data:
+            return None
+        resume_id = entity_data.get("resume_id")
+        if resume_id is not None:
+            return resume_id
+        return entity_data.get("last_id")
+
+    async def set_resume_point(self, entity_id: Union[str, int], message_id: int):
+        """
+        Advance the resume marker for an entity.
+
+        The marker is the highest message ID below which every message is fully
+        processed, so an interrupted export can restart from it without
+        skipping messages that were still in flight. It only moves forward.
+
+        Args:
+            entity_id (Union[str, int]): The entity identifier.
+            message_id (int): Candidate resume message ID.
+
+        Returns:
+            None
+        """
+        def update(data):
+            current = data.get("resume_id")
+            if current is None or message_id > current:
+                data["resume_id"] = message_id
+        await self._with_entity_data(entity_id, update, modify=True)
@@ -72,9 +72,11 @@ class Config:
         request_delay (float, optional): Delay between requests. Defaults to 0.5.
         message_batch_size (int, optional): Batch size for messages. Defaults to 100.
         image_quality (int, optional): Image quality. Defaults to 85.
+        preserve_alpha (bool, optional): Keep transparency by saving alpha images as PNG. Defaults to False.
         video_crf (int, optional): Video CRF. Defaults to 28.
-        video_preset (str, optional): Video preset. Defaults to "fast".
-        hw_acceleration (str, optional): Hardware acceleration. Defaults to "none".
+        video_preset (str, optional): Video preset. Defaults to "faster".
+        video_encoder (str, optional): Software video encoder ("libx264" or "libsvtav1"). Defaults to "libx264".
+        hw_acceleration (str, optional): Hardware acceleration ("none", "auto", "nvidia", "amd", "intel"). Defaults to "none".
         use_h265 (bool, optional): Use H265 encoding. Defaults to False.
         cache_file (Path, optional): Path to cache file. Defaults to DEFAULT_CACHE_PATH.
         interactive_mode (bool, optional): Interactive mode. Defaults to False.
@@ -105,8 +107,10 @@ class Config:
     request_delay: float = 0.5
     message_batch_size: int = 100
     image_quality: int = 85
+    preserve_alpha: bool = False
     video_crf: int = 28
-    video_preset: str = "fast"
+    video_preset: str = "faster"
+    video_encoder: str = "libx264"
     hw_acceleration: str = "none"
     use_h265: bool = False
     cache_file: Path = field(default=DEFAULT_CACHE_PATH)
@@ -193,8 +197,10 @@ class Config:
                 "request_delay": float(os.getenv("REQUEST_DELAY", 0.5)),
                 "message_batch_size": int(os.getenv("MESSAGE_BATCH_SIZE", 100)),
                 "image_quality": int(os.getenv("IMAGE_QUALITY", 85)),
+                "preserve_alpha": _parse_bool(os.getenv("PRESERVE_ALPHA"), False),
                 "video_crf": int(os.getenv("VIDEO_CRF", 28)),
-                "video_preset": os.getenv("VIDEO_PRESET", "fast"),
+                "video_preset": os.getenv("VIDEO_PRESET", "faster"),
+                "video_encoder": os.getenv("VIDEO_ENCODER", "libx264"),
                 "hw_acceleration": os.getenv("HW_ACCELERATION", "none"),
                 "use_h265": _parse_bool(os.getenv("USE_H265"), False),
                 "cache_file": Path(os.getenv("CACHE_FILE", DEFAULT_CACHE_PATH)),
@@ -239,6 +245,9 @@ class Config:
         self.export_path = Path(self.export_path).resolve()
         self.cache_file = Path(self.cache_file).resolve()
 
+        if self.download_workers is None:
+            self.download_workers = int(self.workers * 1.5)
+
         for path in [self.export_path, self.cache_file.parent]:
             try:
                 path.mkdir(parents=True, exist_ok=True)
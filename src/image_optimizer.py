@@ -0,0 +1,161 @@
+import shutil
+import subprocess
+from pathlib import Path
+
+from PIL import Image, ImageFile
+
+from src.utils import logger
+
+try:
+    import pyvips
+except ImportError:
+    pyvips = None
+
+ImageFile.LOAD_TRUNCATED_IMAGES = True
+
+# Longest image side kept after optimization; larger sources are scaled down.
+MAX_IMAGE_DIMENSION = 2560
+
+
+def _compress_png(output_path: Path):
+    """
+    Recompresses a PNG in place with oxipng when the binary is available.
+
+    Args:
+        output_path (Path): Path to the PNG to recompress.
+    """
+    oxipng = shutil.which("oxipng")
+    if not oxipng:
+        return
+    try:
+        subprocess.run(
+            [oxipng, "--quiet", str(output_path)],
+            capture_output=True, timeout=60, check=True
+        )
+    except (subprocess.SubprocessError, OSError) as e:
+        logger.debug(f"oxipng failed for {output_path.name}: {e}")
+
+
+def _optimize_with_pyvips(input_path: Path, output_path: Path, quality: int, preserve_alpha: bool = False) -> Path:
+    """
+    Re-encodes an image using libvips. This is a blocking function.
+
+    Args:
+        input_path (Path): Path to the source image.
+        output_path (Path): Requested output path; its suffix is adjusted
+            to match the format actually written.
+        quality (int): JPEG quality (1-100).
+        preserve_alpha (bool): Save sources with transparency as PNG
+            instead of flattening them onto white.
+
+    Returns:
+        Path: The file actually written (.png or .jpg).
+    """
+    # thumbnail decodes at a reduced scale where the format allows it and
+    # never upscales with size="down".
+    image = pyvips.Image.thumbnail(
+        str(input_path), MAX_IMAGE_DIMENSION, height=MAX_IMAGE_DIMENSION, size="down"
+    )
+    if image.hasalpha():
+        if preserve_alpha:
+            png_path = output_path.with_suffix('.png')
+            image.pngsave(str(png_path))
+            _compress_png(png_path)
+            return png_path
+        image = image.flatten(background=[255, 255, 255])
+    jpeg_path = output_path.with_suffix('.jpg')
+    image.jpegsave(str(jpeg_path), Q=quality)
+    return jpeg_path
+
+
+def _optimize_with_pillow(input_path: Path, output_path: Path, quality: int, preserve_alpha: bool = False) -> Path:
+    """
+    Re-encodes an image using Pillow. This is a blocking function.
+
+    Args:
+        input_path (Path): Path to the source image.
+        output_path (Path): Requested output path; its suffix is adjusted
+            to match the format actually written.
+        quality (int): JPEG quality (1-100).
+        preserve_alpha (bool): Save sources with transparency as PNG
+            instead of flattening them onto white.
+
+    Returns:
+        Path: The file actually written (.png or .jpg).
+    """
+    with Image.open(input_path) as img:
+        # draft lets JPEG sources decode directly at a reduced scale.
+        if max(img.size) > MAX_IMAGE_DIMENSION:
+            img.draft('RGB', (MAX_IMAGE_DIMENSION, MAX_IMAGE_DIMENSION))
+        else:
+            img.draft('RGB', img.size)
+        if img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info):
+            if preserve_alpha:
+                rgba = img if img.mode == "RGBA" else img.convert("RGBA")
+                if max(rgba.size) > MAX_IMAGE_DIMENSION:
+                    rgba.thumbnail((MAX_IMAGE_DIMENSION, MAX_IMAGE_DIMENSION), Image.Resampling.LANCZOS)
+                png_path = output_path.with_suffix('.png')
+                rgba.save(str(png_path), format="PNG", optimize=True)
+                _compress_png(png_path)
+                return png_path
+            # Flatten transparency onto white in C via alpha_composite;
+            # a bare convert("RGB") would leave black where alpha was.
+            rgba = img if img.mode == "RGBA" else img.convert("RGBA")
+            background = Image.new("RGBA", rgba.size, (255, 255, 255, 255))
+            img = Image.alpha_composite(background, rgba).convert("RGB")
+        elif img.mode not in ("RGB", "L"):
+            img = img.convert("RGB")
+        if max(img.size) > MAX_IMAGE_DIMENSION:
+            img.thumbnail((MAX_IMAGE_DIMENSION, MAX_IMAGE_DIMENSION), Image.Resampling.LANCZOS)
+        # optimize/progressive cost an extra full encode pass each for a
+        # few percent of size; 4:2:0 subsampling gives more for less.
+        jpeg_path = output_path.with_suffix('.jpg')
+        img.save(
+            str(jpeg_path), format="JPEG",
+            quality=quality, subsampling=2
+        )
+        return jpeg_path
+
+
+def optimize_image(input_path: Path, output_path: Path, quality: int, preserve_alpha: bool = False) -> Path:
+    """
+    Re-encodes an image at the given quality. This is a blocking function.
+
+    Module-level and dependent only on its arguments, so it can run in a
+    thread or be pickled into a process pool worker. Uses libvips when the
+    optional pyvips package is installed, Pillow otherwise. Falls back to a
+    plain copy when the source cannot be re-encoded or the re-encoded file
+    would be larger than the original.
+
+    Args:
+        input_path (Path): Path to the source image.
+        output_path (Path): Requested output path; the suffix of the file
+            actually written follows the encoded format.
+        quality (int): JPEG quality (1-100).
+        preserve_alpha (bool): Keep transparency by saving alpha sources as
+            PNG (recompressed with oxipng when installed) instead of
+            flattening them onto a white JPEG.
+
+    Returns:
+        Path: The file actually written. Differs from output_path in
+        suffix when the encoded format does (e.g. .png for preserved
+        alpha), or matches it exactly on the plain-copy fallback.
+    """
+    try:
+        original_size = input_path.stat().st_size
+        if pyvips is not None:
+            written_path = _optimize_with_pyvips(input_path, output_path, quality, preserve_alpha)
+        else:
+            written_path = _optimize_with_pillow(input_path, output_path, quality, preserve_alpha)
+
+        if written_path.stat().st_size >= original_size:
+            # Keep the original bytes (and their extension) instead.
+            shutil.copyfile(input_path, output_path)
+            if written_path != output_path:
+                written_path.unlink(missing_ok=True)
+            return output_path
+        return written_path
+    except Exception as e:
+        logger.warning(f"Image optimization failed for {input_path.name}, copying original: {e}")
+        shutil.copyfile(input_path, output_path)
+        return output_path
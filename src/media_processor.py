@@ -1,10 +1,15 @@
 import asyncio
 import mimetypes
 import os
+import re
 import shutil
+import subprocess
 import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
-from typing import List, Optional, Union
+from typing import Dict, List, Optional, Tuple, Union
 
 import aiofiles
 import aiofiles.os
@@ -25,6 +30,7 @@ from telethon.tl.types import (
 )
 
 from src.config import Config
+from src.image_optimizer import optimize_image
 from src.utils import logger, sanitize_filename
 
 ImageFile.LOAD_TRUNCATED_IMAGES = True
@@ -33,6 +39,39 @@ AIOHTTP_HEADERS = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
 }
 
+# Media type -> subdirectory name under the entity's media path.
+SUBDIR_MAP = {
+    "image": "images",
+    "video": "videos",
+    "round_video": "round_videos",
+    "audio": "audios",
+    "document": "documents",
+}
+
+# Upper bound on the per-run media id -> path memo; oldest entries are evicted first.
+MEDIA_CACHE_MAX_ENTRIES = 10_000
+
+# Upper bound on cached ffprobe results; download retries re-probing the
+# same file are the only expected hits, so this can stay small.
+PROBE_CACHE_MAX_ENTRIES = 256
+
+# Files at least this large are downloaded with several concurrent streams.
+PARALLEL_DOWNLOAD_THRESHOLD = 10 * 1024 * 1024
+PARALLEL_DOWNLOAD_STREAMS = 4
+# Telegram requires request sizes to be 4 KiB-aligned and at most 1 MiB.
+PARALLEL_DOWNLOAD_CHUNK = 512 * 1024
+# Parallel downloads at least this large preallocate their disk space up front.
+PREALLOCATE_THRESHOLD = 50 * 1024 * 1024
+
+# Videos smaller than this are copied as-is instead of re-encoded.
+SMALL_VIDEO_COPY_THRESHOLD = 1024 * 1024
+
+# One image-encoding pool shared by every MediaProcessor: comment export
+# builds a throwaway instance per note, and a pool per instance would leak
+# worker processes until interpreter exit.
+_image_pool: Optional[ProcessPoolExecutor] = None
+_image_pool_broken = False
+
 async def async_ensure_dir_exists(path: Path):
     """Асинхронно убеждается, что директория существует."""
     await aiofiles.os.makedirs(path, exist_ok=True)
@@ -76,8 +115,8 @@ class ProgressCallback:
             return
 
         speed_kbps = ((downloaded_bytes - self.last_downloaded) / elapsed) / 1024
-        threshold = getattr(self.config, 'throttle_threshold_kbps', 50)
-        pause_duration = getattr(self.config, 'throttle_pause_s', 30)
+        threshold = self.config.throttle_threshold_kbps
+        pause_duration = self.config.throttle_pause_s
 
         if 0 < speed_kbps < threshold:
             self.throttle_counter += 1
@@ -104,11 +143,35 @@ class MediaProcessor:
     def __init__(self, config: Config, client: TelegramClient):
         self.config = config
         self.client = client
-        self.download_semaphore = asyncio.Semaphore(
-            getattr(config, "download_workers", int(getattr(config, "workers", 8) * 1.5))
-        )
-        self.processed_cache = {}
+        self.download_semaphore = asyncio.Semaphore(config.download_workers)
+        self.processed_cache: OrderedDict = OrderedDict()
         self._cache_lock = asyncio.Lock()
+        self._available_encoders: Optional[set] = None
+        self._ensured_dirs: set = set()
+        self._probe_cache: OrderedDict = OrderedDict()
+        # Cap concurrent ffmpeg runs and give each a fair share of cores:
+        # one encode already scales across threads, so stacking unbounded
+        # encodes just causes cache-thrashing oversubscription.
+        ffmpeg_jobs = max(1, (os.cpu_count() or 4) // 4)
+        self._ffmpeg_semaphore = asyncio.Semaphore(ffmpeg_jobs)
+        self._ffmpeg_threads = str(max(1, (os.cpu_count() or 4) // ffmpeg_jobs))
+        self._hw_encode_failed = False
+
+    async def prepare(self, entity_media_path: Path):
+        """
+        Pre-creates the per-type media subdirectories for an entity.
+
+        Called once per export target so the per-item path checks in
+        _process_single_item always hit the ensured-directory memo.
+
+        Args:
+            entity_media_path (Path): Media root for the entity.
+        """
+        for subdir in SUBDIR_MAP.values():
+            type_subdir = entity_media_path / subdir
+            if type_subdir not in self._ensured_dirs:
+                await async_ensure_dir_exists(type_subdir)
+                self._ensured_dirs.add(type_subdir)
 
     async def download_and_optimize_media(
         self, message: Message, entity_id: Union[str, int], entity_media_path: Path,
@@ -236,11 +299,35 @@ class MediaProcessor:
             doc (Document): Telegram document object.
 
         Returns:
-            str: Type of the document ('video', 'round_video', 'audio', or 'document').
+            str: Type of the document ('image', 'video', 'round_video', 'audio', or 'document').
         """
-        if any(isinstance(attr, DocumentAttributeVideo) for attr in doc.attributes):
-            return "round_video" if any(getattr(attr, 'round_message', False) for attr in doc.attributes if isinstance(attr, DocumentAttributeVideo)) else "video"
-        return "audio" if any(isinstance(attr, DocumentAttributeAudio) for attr in doc.attributes) else "document"
+        # Alpha-capable image documents only go through the image pipeline
+        # when PRESERVE_ALPHA is set; otherwise they keep the old
+        # keep-as-document behavior instead of being flattened to JPEG.
+        if self.config.preserve_alpha and getattr(doc, 'mime_type', None) in ('image/png', 'image/webp'):
+            return "image"
+        is_video = is_round = is_audio = False
+        for attr in doc.attributes:
+            if isinstance(attr, DocumentAttributeVideo):
+                is_video = True
+                if getattr(attr, 'round_message', False):
+                    is_round = True
+            elif isinstance(attr, DocumentAttributeAudio):
+                is_audio = True
+        if is_video:
+            return "round_video" if is_round else "video"
+        return "audio" if is_audio else "document"
+
+    def _remember_media_path(self, cache_key, path: Path):
+        """
+        Stores an (entity id, media id) -> path mapping, evicting the least
+        recently used entries past MEDIA_CACHE_MAX_ENTRIES. Caller must hold
+        _cache_lock.
+        """
+        self.processed_cache[cache_key] = path
+        self.processed_cache.move_to_end(cache_key)
+        while len(self.processed_cache) > MEDIA_CACHE_MAX_ENTRIES:
+            self.processed_cache.popitem(last=False)
 
     async def _process_single_item(
             self, message: Message, entity_id_str: str, media_type: str, entity_media_path: Path, progress_queue=None, task_id=None
@@ -259,6 +346,8 @@ class MediaProcessor:
         Returns:
             Optional[Path]: Path to the processed media file, or None if failed.
         """
+        cache_key = None
+        owned_future = None
         try:
             if isinstance(message.media, MessageMediaPhoto) and isinstance(message.media.photo, Photo):
                 media_obj = message.media.photo
@@ -268,8 +357,37 @@ class MediaProcessor:
                 logger.error(f"Unsupported media type in message {message.id}")
                 return None
 
+            media_id = getattr(media_obj, 'id', None)
+            if media_id is not None:
+                # Keyed per entity: the same forwarded media must still be
+                # downloaded into each export target's own media folder.
+                cache_key = (entity_id_str, media_id)
+                async with self._cache_lock:
+                    cached_entry = self.processed_cache.get(cache_key)
+                    if cached_entry is not None:
+                        self.processed_cache.move_to_end(cache_key)
+                    else:
+                        # First caller for this media id: claim it so concurrent
+                        # callers await our result instead of re-downloading.
+                        owned_future = asyncio.get_running_loop().create_future()
+                        self.processed_cache[cache_key] = owned_future
+                if owned_future is None:
+                    if isinstance(cached_entry, asyncio.Future):
+                        try:
+                            cached_entry = await asyncio.shield(cached_entry)
+                        except Exception:
+                            cached_entry = None
+                    if cached_entry is not None and await aiofiles.os.path.exists(cached_entry):
+                        if progress_queue and task_id:
+                            total_size = getattr(message.file, 'size', 0) if message.file else 0
+                            if total_size > 0:
+                                await progress_queue.put({
+                                    "type": "update", "task_id": task_id, "data": {"advance": total_size}
+                                })
+                        return cached_entry
+
             filename = self._get_filename(media_obj, message.id, media_type, entity_id_str)
-            type_subdir = entity_media_path / f"{media_type}s"
+            type_subdir = entity_media_path / SUBDIR_MAP.get(media_type, f"{media_type}s")
             final_path = type_subdir / filename
             raw_download_path = type_subdir / f"raw_{filename}"
 
@@ -287,33 +405,115 @@ class MediaProcessor:
                          await progress_queue.put({
                             "type": "update", "task_id": task_id, "data": {"advance": total_size}
                         })
+                if cache_key is not None:
+                    async with self._cache_lock:
+                        self._remember_media_path(cache_key, final_path)
+                    if owned_future is not None and not owned_future.done():
+                        owned_future.set_result(final_path)
                 return final_path
 
-            await async_ensure_dir_exists(type_subdir)
+            if type_subdir not in self._ensured_dirs:
+                await async_ensure_dir_exists(type_subdir)
+                self._ensured_dirs.add(type_subdir)
 
             downloaded_ok = await self._download_media(message, raw_download_path, filename, progress_queue=progress_queue, task_id=task_id)
             if not downloaded_ok:
                 await self._cleanup_file_async(raw_download_path)
                 return None
 
-            optimization_success = await self._optimize_media(raw_download_path, final_path, media_type)
-            if optimization_success:
-                if raw_download_path != final_path:
-                    await self._cleanup_file_async(raw_download_path)
+            media_size, final_path = await self._optimize_media(raw_download_path, final_path, media_type)
+            if media_size is not None:
                 if cache_manager:
-                    stat_result = await aiofiles.os.stat(final_path)
-                    media_size = stat_result.st_size if stat_result else 0
                     await cache_manager.add_media_file_to_message(
                         entity_id_str, message.id, final_path.name, media_size
                     )
+                if cache_key is not None:
+                    async with self._cache_lock:
+                        self._remember_media_path(cache_key, final_path)
+                    if owned_future is not None and not owned_future.done():
+                        owned_future.set_result(final_path)
                 return final_path
             else:
                 logger.error(f"Media processing failed for msg {message.id}, type {media_type}")
                 await self._cleanup_file_async(raw_download_path)
                 return None
         except Exception as e:
-            logger.error(f"Error in media processing pipeline for msg {getattr(message, 'id', 'unknown')}: {e}", exc_info=True)
+            logger.error(f"Error in media processing pipeline for msg {getattr(message, 'id', 'unknown')}: {e}", exc_info=(self.config.log_level == 'DEBUG'))
             return None
+        finally:
+            if owned_future is not None and not owned_future.done():
+                # Processing failed: unblock waiters and drop the claim so a
+                # later message with the same media can retry the download.
+                owned_future.set_result(None)
+                async with self._cache_lock:
+                    if self.processed_cache.get(cache_key) is owned_future:
+                        del self.processed_cache[cache_key]
+
+    async def _download_media_parallel(
+            self, message: Message, raw_download_path: Path, total_size: int, progress_queue=None, task_id=None,
+            advanced_counter: Optional[List[int]] = None
+    ) -> bool:
+        """
+        Downloads a large media file over several concurrent Telegram streams.
+
+        The file is split into contiguous, chunk-aligned parts; each part is
+        fetched with its own iter_download stream and written in place with
+        os.pwrite, so no reassembly pass is needed afterwards.
+
+        Args:
+            message (Message): Telegram message object.
+            raw_download_path (Path): Path to save the downloaded file.
+            total_size (int): Declared size of the file in bytes.
+            progress_queue: asyncio.Queue for progress updates (optional).
+            task_id: Progress task id (optional).
+            advanced_counter (Optional[List[int]]): Single-element list
+                incremented by every byte reported to the progress queue,
+                so the caller can reconcile a failed attempt's partial
+                progress instead of counting it twice.
+
+        Returns:
+            bool: True if the whole file was downloaded.
+        """
+        part_count = min(PARALLEL_DOWNLOAD_STREAMS, max(1, total_size // PARALLEL_DOWNLOAD_CHUNK))
+        total_chunks = (total_size + PARALLEL_DOWNLOAD_CHUNK - 1) // PARALLEL_DOWNLOAD_CHUNK
+        chunks_per_part = (total_chunks + part_count - 1) // part_count
+        part_size = chunks_per_part * PARALLEL_DOWNLOAD_CHUNK
+
+        fd = os.open(str(raw_download_path), os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            if total_size >= PREALLOCATE_THRESHOLD and hasattr(os, 'posix_fallocate'):
+                # Reserving the full extent up front keeps the four pwrite
+                # streams from fragmenting the file or racing ENOSPC mid-way.
+                try:
+                    await asyncio.to_thread(os.posix_fallocate, fd, 0, total_size)
+                except OSError as e:
+                    logger.debug("posix_fallocate unavailable for {}: {}", raw_download_path.name, e)
+
+            async def fetch_part(start: int):
+                end = min(start + part_size, total_size)
+                pos = start
+                async for chunk in self.client.iter_download(
+                        message.media, offset=start, request_size=PARALLEL_DOWNLOAD_CHUNK):
+                    data = chunk[:end - pos] if len(chunk) > end - pos else chunk
+                    await asyncio.to_thread(os.pwrite, fd, data, pos)
+                    pos += len(data)
+                    if progress_queue is not None and task_id is not None and data:
+                        if advanced_counter is not None:
+                            advanced_counter[0] += len(data)
+                        await progress_queue.put({
+                            "type": "update", "task_id": task_id, "data": {"advance": len(data)}
+                        })
+                    if pos >= end:
+                        break
+                return pos - start
+
+            written = await asyncio.gather(*(
+                fetch_part(start) for start in range(0, total_size, part_size)
+            ))
+        finally:
+            await asyncio.to_thread(os.close, fd)
+
+        return sum(written) == total_size
 
     async def _download_media(self, message: Message, raw_download_path: Path, filename: str, progress_queue=None, task_id=None) -> bool:
         """
@@ -331,21 +531,41 @@ class MediaProcessor:
         """
         try:
             async with self.download_semaphore:
+                total_size = getattr(message.file, 'size', 0) if message.file else 0
+                # Bytes the parallel attempt has already shown on the
+                # progress bar; the fallback must not report them again.
+                parallel_advanced = [0]
+                if total_size >= PARALLEL_DOWNLOAD_THRESHOLD:
+                    try:
+                        if await self._download_media_parallel(message, raw_download_path, total_size, progress_queue, task_id, parallel_advanced):
+                            return True
+                    except Exception as e:
+                        logger.warning(f"Parallel download failed for {filename}, falling back to single stream: {e}")
+                        await self._cleanup_file_async(raw_download_path)
+
                 last_reported_bytes = 0
 
                 async def callback(current, total):
                     nonlocal last_reported_bytes
-                    if progress_queue is not None and task_id is not None:
-                        advanced = current - last_reported_bytes
-                        if advanced > 0:
-                            await progress_queue.put({
-                                "type": "update",
-                                "task_id": task_id,
-                                "data": {"advance": advanced}
-                            })
-                            last_reported_bytes = current
+                    if progress_queue is None or task_id is None:
+                        return
+                    advanced = current - last_reported_bytes
+                    if advanced <= 0:
+                        return
+                    last_reported_bytes = current
+                    # Swallow what the failed parallel attempt already
+                    # advanced before reporting the rest.
+                    absorbed = min(parallel_advanced[0], advanced)
+                    parallel_advanced[0] -= absorbed
+                    advanced -= absorbed
+                    if advanced > 0:
+                        await progress_queue.put({
+                            "type": "update",
+                            "task_id": task_id,
+                            "data": {"advance": advanced}
+                        })
 
-                await self.client.download_media(
+                downloaded = await self.client.download_media(
                     message=message,
                     file=str(raw_download_path),
                     progress_callback=callback
@@ -353,9 +573,8 @@ class MediaProcessor:
 
                 # After download, ensure the progress is complete by advancing the remainder.
                 if progress_queue is not None and task_id is not None:
-                    total_size = getattr(message.file, 'size', 0) if message.file else 0
                     if total_size > 0:
-                        remaining = total_size - last_reported_bytes
+                        remaining = total_size - last_reported_bytes - parallel_advanced[0]
                         if remaining > 0:
                             await progress_queue.put({
                                 "type": "update",
@@ -363,14 +582,16 @@ class MediaProcessor:
                                 "data": {"advance": remaining}
                             })
 
-                return await aiofiles.os.path.exists(raw_download_path)
+                # Telethon returns the destination path (or bytes) on success,
+                # so no extra exists() round trip is needed.
+                return downloaded is not None
         except Exception as e:
-            logger.error(f"Download failed for {filename}: {e}", exc_info=True)
+            logger.error(f"Download failed for {filename}: {e}", exc_info=(self.config.log_level == 'DEBUG'))
             return False
 
-    async def _optimize_media(self, raw_path: Path, final_path: Path, media_type: str) -> bool:
+    async def _optimize_media(self, raw_path: Path, final_path: Path, media_type: str) -> Tuple[Optional[int], Path]:
         """
-        Optimizes a downloaded media file based on its type.
+        Optimizes a downloaded media file based on its type and removes the raw file.
 
         Args:
             raw_path (Path): Path to the raw downloaded file.
@@ -378,12 +599,13 @@ class MediaProcessor:
             media_type (str): Type of media ('image', 'video', etc.).
 
         Returns:
-            bool: True if optimization succeeded, False otherwise.
+            Tuple[Optional[int], Path]: Size in bytes of the final file (or
+            None on failure) and the path actually written — the image
+            pipeline may change the suffix to match the encoded format.
         """
         try:
             if media_type == "image":
-                # shutil.copy is blocking, run in an executor thread
-                await asyncio.to_thread(shutil.copy, raw_path, final_path)
+                final_path = await self._optimize_image(raw_path, final_path)
             elif media_type in ["video", "round_video"]:
                 await self._optimize_video(raw_path, final_path)
             elif media_type == "audio":
@@ -391,10 +613,44 @@ class MediaProcessor:
             else:
                 # Use aiofiles for async rename
                 await aiofiles.os.rename(raw_path, final_path)
-            return await aiofiles.os.path.exists(final_path)
+            if raw_path != final_path:
+                await self._cleanup_file_async(raw_path)
+            # The one stat that confirms success also yields the size the
+            # caller records in the cache.
+            stat_result = await asyncio.to_thread(self._try_stat, final_path)
+            return (stat_result.st_size if stat_result else None), final_path
         except Exception as e:
             logger.error(f"Failed to process {media_type} {raw_path.name}: {e}")
-            return False
+            return None, final_path
+
+    def _probe_media(self, input_path: Path) -> dict:
+        """
+        Probes a media file with ffprobe, caching by path and size. This is a blocking function.
+
+        Download retries re-enter the optimizers with the same file; the cache
+        spares the repeated ffprobe process spawn in that case.
+        """
+        stat_result = self._try_stat(input_path)
+        key = (str(input_path), stat_result.st_size if stat_result else -1)
+        probe = self._probe_cache.get(key)
+        if probe is None:
+            probe = ffmpeg.probe(str(input_path))
+            self._probe_cache[key] = probe
+            while len(self._probe_cache) > PROBE_CACHE_MAX_ENTRIES:
+                self._probe_cache.popitem(last=False)
+        else:
+            self._probe_cache.move_to_end(key)
+        return probe
+
+    @staticmethod
+    def _try_stat(path: Path) -> Optional[os.stat_result]:
+        """
+        Stats a path, returning None instead of raising when it is missing.
+        """
+        try:
+            return path.stat()
+        except OSError:
+            return None
 
     async def _cleanup_file_async(self, file_path: Path):
         """
@@ -404,8 +660,9 @@ class MediaProcessor:
             file_path (Path): Path to the file to delete.
         """
         try:
-            if await aiofiles.os.path.exists(file_path):
-                await aiofiles.os.remove(file_path)
+            await aiofiles.os.remove(file_path)
+        except FileNotFoundError:
+            pass
         except Exception as e:
             logger.warning(f"Could not clean up file {file_path}: {e}")
 
@@ -428,14 +685,18 @@ class MediaProcessor:
         if isinstance(media_obj, Photo):
             ext = ".jpg"
         elif isinstance(media_obj, Document):
-            original_filename = next((attr.file_name for attr in getattr(media_obj, 'attributes', []) if isinstance(attr, DocumentAttributeFilename)), None)
+            attrs_by_type = {type(attr): attr for attr in getattr(media_obj, 'attributes', [])}
+            filename_attr = attrs_by_type.get(DocumentAttributeFilename)
+            original_filename = filename_attr.file_name if filename_attr else None
+            audio_attr = attrs_by_type.get(DocumentAttributeAudio)
+            is_voice = bool(audio_attr and getattr(audio_attr, 'voice', False))
             if original_filename and Path(original_filename).suffix:
                 ext = Path(original_filename).suffix
             elif hasattr(media_obj, 'mime_type') and '/' in media_obj.mime_type:
                 ext = mimetypes.guess_extension(media_obj.mime_type) or ext
             if media_type in ['video', 'round_video'] and ext.lower() in ['.dat', '.bin']:
                 ext = '.mp4'
-            elif media_type == 'audio' and any(getattr(attr, 'voice', False) for attr in media_obj.attributes if isinstance(attr, DocumentAttributeAudio)):
+            elif media_type == 'audio' and is_voice:
                 ext = '.ogg'
 
         safe_base = sanitize_filename(base_name, max_length=180, replacement='_')
@@ -444,32 +705,121 @@ class MediaProcessor:
             safe_ext = '.' + safe_ext
         return f"{safe_base}{safe_ext}"
 
+    def _get_image_pool(self) -> Optional[ProcessPoolExecutor]:
+        """
+        Lazily creates the process pool used for image re-encoding.
+
+        Image decoding/encoding holds the GIL for most of its runtime, so
+        separate processes let several images be optimized in parallel. The
+        pool is a module-level singleton shared by all instances. Returns
+        None when the pool could not be created (or broke earlier), in
+        which case callers fall back to a thread.
+        """
+        global _image_pool, _image_pool_broken
+        if _image_pool_broken:
+            return None
+        if _image_pool is None:
+            try:
+                workers = max(1, min(self.config.download_workers, (os.cpu_count() or 2) // 2))
+                _image_pool = ProcessPoolExecutor(max_workers=workers)
+            except OSError as e:
+                logger.warning(f"Could not start image process pool, using threads: {e}")
+                _image_pool_broken = True
+                return None
+        return _image_pool
+
+    async def _optimize_image(self, input_path: Path, output_path: Path) -> Path:
+        """
+        Asynchronously optimizes an image file in a worker process.
+
+        optimize_image is module-level and only depends on its arguments, so
+        it pickles cleanly into the pool. Falls back to a thread if the pool
+        is unavailable or dies mid-job.
+
+        Returns:
+            Path: The file actually written; its suffix may differ from
+            output_path when the encoded format does.
+        """
+        pool = self._get_image_pool()
+        if pool is not None:
+            loop = asyncio.get_running_loop()
+            try:
+                return await loop.run_in_executor(
+                    pool, optimize_image, input_path, output_path,
+                    self.config.image_quality, self.config.preserve_alpha
+                )
+            except BrokenProcessPool as e:
+                logger.warning(f"Image process pool died, falling back to threads: {e}")
+                global _image_pool_broken
+                _image_pool_broken = True
+                pool.shutdown(wait=False, cancel_futures=True)
+        return await asyncio.to_thread(
+            optimize_image, input_path, output_path,
+            self.config.image_quality, self.config.preserve_alpha
+        )
+
     async def _optimize_video(self, input_path: Path, output_path: Path):
         """
         Asynchronously optimizes a video file by running the sync version in a separate thread.
         """
-        await asyncio.to_thread(self._sync_optimize_video, input_path, output_path)
+        async with self._ffmpeg_semaphore:
+            await asyncio.to_thread(self._sync_optimize_video, input_path, output_path)
 
     def _sync_optimize_video(self, input_path: Path, output_path: Path):
         """
         Synchronously optimizes a video file using ffmpeg. This is a blocking function.
         """
         try:
-            hw_acceleration = getattr(self.config, 'hw_acceleration', 'none').lower()
-            use_h265 = getattr(self.config, 'use_h265', True)
-            probe = ffmpeg.probe(str(input_path))
+            if input_path == output_path:
+                logger.warning(f"Video optimize called with identical input/output: {input_path}")
+                return
+
+            # Re-encoding tiny clips (stickers, short round videos) costs a
+            # full ffmpeg run to save next to nothing.
+            stat_result = self._try_stat(input_path)
+            if stat_result and stat_result.st_size < SMALL_VIDEO_COPY_THRESHOLD:
+                shutil.copyfile(input_path, output_path)
+                return
+
+            hw_acceleration = self.config.hw_acceleration.lower()
+            if hw_acceleration == 'auto':
+                hw_acceleration = self._detect_hw_acceleration()
+            # A compiled-in encoder does not guarantee working hardware;
+            # after one runtime failure stop trying the hw path for the run.
+            if self._hw_encode_failed:
+                hw_acceleration = 'none'
+            use_h265 = self.config.use_h265
+            probe = self._probe_media(input_path)
             video_stream = next((s for s in probe['streams'] if s['codec_type'] == 'video'), None)
             if not video_stream:
                 logger.warning(f"No video stream in {input_path.name}, copying directly.")
-                ffmpeg.input(str(input_path)).output(str(output_path), c='copy').global_args('-hide_banner', '-loglevel', 'error', '-nostats').run(capture_stderr=True, overwrite_output=True)
+                shutil.copyfile(input_path, output_path)
                 return
 
             width = int(video_stream.get('width', 0))
             height = int(video_stream.get('height', 0))
             optimal_bitrate = self._calculate_optimal_bitrate(width, height)
+
+            # Already-compliant h264/mp4 files at or below the target bitrate
+            # only need a remux with faststart, not a full re-encode. If just
+            # the audio track is off-spec, copy the video and re-encode audio.
+            if output_path.suffix.lower() == '.mp4' and video_stream.get('codec_name') == 'h264':
+                source_bitrate = int(video_stream.get('bit_rate') or probe.get('format', {}).get('bit_rate') or 0)
+                target_bitrate = int(optimal_bitrate.replace('k', '')) * 1000
+                if 0 < source_bitrate <= target_bitrate * 1.2:
+                    source_audio = next((st for st in probe['streams'] if st['codec_type'] == 'audio'), None)
+                    if source_audio is None or source_audio.get('codec_name') in ('aac', 'mp3'):
+                        copy_options = {'c': 'copy'}
+                    else:
+                        copy_options = {'c:v': 'copy', 'c:a': 'aac', 'b:a': self._calculate_audio_bitrate(source_audio.get('bit_rate'), int(source_audio.get('channels', 2)))}
+                    ffmpeg.input(str(input_path)).output(
+                        str(output_path), movflags='+faststart', **copy_options
+                    ).global_args('-hide_banner', '-loglevel', 'error', '-nostats').run(capture_stderr=True, overwrite_output=True, quiet=True)
+                    return
+
             stream = ffmpeg.input(str(input_path))
-            ffmpeg_options = {'pix_fmt': 'yuv420p', 'threads': '0', 'movflags': '+faststart'}
-            base_crf = getattr(self.config, 'video_crf', 23)
+            ffmpeg_options = {'pix_fmt': 'yuv420p', 'threads': self._ffmpeg_threads, 'movflags': '+faststart'}
+            base_crf = self.config.video_crf
             compression_crf = min(base_crf + 5, 35)
 
             output_ext = output_path.suffix.lower()
@@ -487,6 +837,10 @@ class MediaProcessor:
                     self._configure_amd_encoder(ffmpeg_options, use_h265, compression_crf, optimal_bitrate)
                 elif hw_acceleration == 'intel':
                     self._configure_intel_encoder(ffmpeg_options, use_h265, optimal_bitrate)
+                elif hw_acceleration == 'videotoolbox':
+                    self._configure_videotoolbox_encoder(ffmpeg_options, use_h265, optimal_bitrate)
+                elif hw_acceleration == 'vaapi':
+                    self._configure_vaapi_encoder(ffmpeg_options, use_h265, compression_crf, optimal_bitrate)
                 else:
                     self._configure_software_encoder(ffmpeg_options, use_h265, compression_crf, optimal_bitrate)
 
@@ -501,49 +855,73 @@ class MediaProcessor:
 
 
             process = ffmpeg.output(stream, str(output_path), **ffmpeg_options).global_args('-hide_banner', '-loglevel', 'error', '-nostats')
+            used_hw = output_ext != ".webm" and hw_acceleration in ('nvidia', 'amd', 'intel', 'videotoolbox', 'vaapi')
 
             try:
                 # Правильный вызов без check=True
-                process.run(capture_stderr=True, overwrite_output=True)
+                process.run(capture_stderr=True, overwrite_output=True, quiet=True)
             except ffmpeg.Error as e:
-                args = process.get_args()
                 stderr = e.stderr.decode('utf-8', errors='ignore') if e.stderr else "No stderr"
-                logger.error(f"ffmpeg failed for video {input_path.name}. Command: `ffmpeg {' '.join(args)}`. Stderr: {stderr}")
-                # Копируем исходный файл, если оптимизация провалилась
-                if not output_path.exists() or output_path.stat().st_size == 0:
-                    shutil.copy(input_path, output_path)
-                return
+                if used_hw:
+                    # Encoder presence in `ffmpeg -encoders` only proves it
+                    # was compiled in; without the matching GPU/driver the
+                    # encode fails at runtime. Redo this file in software
+                    # and skip the hw path for the rest of the run.
+                    logger.warning(f"Hardware encode ({hw_acceleration}) failed for {input_path.name}, retrying with software encoder: {stderr}")
+                    self._hw_encode_failed = True
+                    ffmpeg_options = {'pix_fmt': 'yuv420p', 'threads': self._ffmpeg_threads, 'movflags': '+faststart'}
+                    self._configure_software_encoder(ffmpeg_options, use_h265, compression_crf, optimal_bitrate)
+                    if audio_stream:
+                        self._configure_audio_options(ffmpeg_options, audio_stream, float(video_stream.get('duration', 0)), 'voice' in input_path.name.lower())
+                    process = ffmpeg.output(ffmpeg.input(str(input_path)), str(output_path), **ffmpeg_options).global_args('-hide_banner', '-loglevel', 'error', '-nostats')
+                    try:
+                        process.run(capture_stderr=True, overwrite_output=True, quiet=True)
+                    except ffmpeg.Error as retry_error:
+                        e = retry_error
+                        stderr = e.stderr.decode('utf-8', errors='ignore') if e.stderr else "No stderr"
+                    else:
+                        e = None
+                if e is not None:
+                    args = process.get_args()
+                    logger.error(f"ffmpeg failed for video {input_path.name}. Command: `ffmpeg {' '.join(args)}`. Stderr: {stderr}")
+                    # Копируем исходный файл, если оптимизация провалилась
+                    if not output_path.exists() or output_path.stat().st_size == 0:
+                        shutil.copyfile(input_path, output_path)
+                    return
 
             # Если оптимизированный файл больше исходного, копируем исходный
-            if output_path.exists() and input_path.exists() and output_path.stat().st_size >= input_path.stat().st_size:
-                shutil.copy(input_path, output_path)
+            output_stat = self._try_stat(output_path)
+            input_stat = self._try_stat(input_path)
+            if output_stat and input_stat and output_stat.st_size >= input_stat.st_size:
+                shutil.copyfile(input_path, output_path)
 
         except ffmpeg.Error as e:
             stderr = e.stderr.decode('utf-8', errors='ignore') if e.stderr else "No stderr"
             logger.error(f"ffmpeg setup failed for video {input_path.name}: {stderr}")
             if not output_path.exists() or output_path.stat().st_size == 0:
-                shutil.copy(input_path, output_path)
+                shutil.copyfile(input_path, output_path)
         except Exception as e:
             logger.error(f"Video optimization failed for {input_path.name}: {e}")
             if not output_path.exists() or output_path.stat().st_size == 0:
-                shutil.copy(input_path, output_path)
+                shutil.copyfile(input_path, output_path)
 
     async def _optimize_audio(self, input_path: Path, output_path: Path):
         """
         Asynchronously optimizes an audio file by running the sync version in a separate thread.
         """
-        await asyncio.to_thread(self._sync_optimize_audio, input_path, output_path)
+        async with self._ffmpeg_semaphore:
+            await asyncio.to_thread(self._sync_optimize_audio, input_path, output_path)
 
     def _sync_optimize_audio(self, input_path: Path, output_path: Path):
         """
         Synchronously optimizes an audio file using ffmpeg. This is a blocking function.
         """
         try:
-            probe = ffmpeg.probe(str(input_path))
+            probe = self._probe_media(input_path)
             audio_stream = next((s for s in probe['streams'] if s['codec_type'] == 'audio'), None)
             if not audio_stream:
                 logger.warning(f"No audio stream in {input_path.name}, copying directly.")
-                ffmpeg.input(str(input_path)).output(str(output_path), c='copy').global_args('-hide_banner', '-loglevel', 'fatal', '-nostats').run(capture_stderr=True, overwrite_output=True)
+                shutil.copyfile(input_path, output_path)
                 return
 
             channels = int(audio_stream.get('channels', 2))
@@ -594,13 +972,55 @@ class MediaProcessor:
             stderr = e.stderr.decode('utf-8', errors='ignore') if e.stderr else "No stderr"
             logger.error(f"ffmpeg failed for audio {input_path.name}: {stderr}")
             try:
-                # Fallback to simple copy if optimization fails
-                shutil.copy2(input_path, output_path)
+                # Fallback to simple copy if optimization fails;
+                # copyfile skips the extra metadata syscalls of copy2.
+                shutil.copyfile(input_path, output_path)
             except Exception as copy_err:
                 logger.error(f"Audio optimization and fallback copy failed for {input_path.name}: {copy_err}")
         except Exception as e:
             logger.error(f"Audio optimization failed for {input_path.name}: {e}")
 
+    def _get_available_encoders(self) -> set:
+        """
+        Returns the set of encoder names the local ffmpeg build supports.
+
+        The `ffmpeg -encoders` probe runs once per MediaProcessor and is cached.
+        """
+        if self._available_encoders is None:
+            try:
+                result = subprocess.run(
+                    ["ffmpeg", "-hide_banner", "-encoders"],
+                    capture_output=True, text=True, timeout=10
+                )
+                self._available_encoders = {
+                    parts[1] for line in result.stdout.splitlines()
+                    if line.startswith(' ') and len(parts := line.split()) >= 2
+                }
+            except Exception as e:
+                logger.warning(f"Could not probe ffmpeg encoders: {e}")
+                self._available_encoders = set()
+        return self._available_encoders
+
+    def _detect_hw_acceleration(self) -> str:
+        """
+        Picks a hardware acceleration backend based on available ffmpeg encoders.
+
+        Returns:
+            str: 'nvidia', 'amd', 'intel', or 'none'.
+        """
+        encoders = self._get_available_encoders()
+        if {'h264_nvenc', 'hevc_nvenc'} & encoders:
+            return 'nvidia'
+        if {'h264_amf', 'hevc_amf'} & encoders:
+            return 'amd'
+        if {'h264_qsv', 'hevc_qsv'} & encoders:
+            return 'intel'
+        if {'h264_videotoolbox', 'hevc_videotoolbox'} & encoders:
+            return 'videotoolbox'
+        if {'h264_vaapi', 'hevc_vaapi'} & encoders:
+            return 'vaapi'
+        return 'none'
+
     def _configure_nvidia_encoder(self, options, use_h265, crf, bitrate):
         codec = 'hevc_nvenc' if use_h265 else 'h264_nvenc'
         options.update({'c:v': codec, 'preset': 'p6', 'rc:v': 'vbr_hq', 'cq': str(crf), 'b:v': bitrate, 'spatial-aq': '1', 'temporal-aq': '1'})
@@ -613,11 +1033,51 @@ class MediaProcessor:
         codec = 'hevc_qsv' if use_h265 else 'h264_qsv'
         options.update({'c:v': codec, 'preset': 'slower', 'b:v': bitrate, 'look_ahead': '1'})
 
+    def _configure_videotoolbox_encoder(self, options, use_h265, bitrate):
+        codec = 'hevc_videotoolbox' if use_h265 else 'h264_videotoolbox'
+        options.update({'c:v': codec, 'b:v': bitrate, 'allow_sw': '1'})
+
+    def _configure_vaapi_encoder(self, options, use_h265, crf, bitrate):
+        codec = 'hevc_vaapi' if use_h265 else 'h264_vaapi'
+        options.update({'vaapi_device': '/dev/dri/renderD128', 'vf': 'format=nv12,hwupload', 'c:v': codec, 'qp': str(crf), 'b:v': bitrate})
+
     def _configure_software_encoder(self, options, use_h265, crf, bitrate):
-        if use_h265:
+        if self.config.video_encoder == 'libsvtav1' and 'libsvtav1' in self._get_available_encoders():
+            # SVT-AV1 preset scale is 0-13 (higher is faster); 8 is comparable
+            # to x264 "faster" in wall time with better compression.
+            options.update({'c:v': 'libsvtav1', 'crf': str(crf), 'preset': '8', 'maxrate': bitrate, 'bufsize': f"{int(bitrate.replace('k', '')) * 2}k"})
+        elif use_h265:
             options.update({'c:v': 'libx265', 'crf': str(crf), 'preset': self.config.video_preset, 'x265-params': "profile=main:level=5.1:no-sao=1:bframes=8:rd=4:psy-rd=1.0:rect=1:aq-mode=3:aq-strength=0.8:deblock=-1:-1", 'maxrate': bitrate, 'bufsize': f"{int(bitrate.replace('k', '')) * 2}k"})
         else:
-            options.update({'c:v': 'libx264', 'crf': str(crf), 'preset': self.config.video_preset, 'profile:v': 'high', 'level': '4.1', 'tune': 'film', 'subq': '9', 'trellis': '2', 'partitions': 'all', 'direct-pred': 'auto', 'me_method': 'umh', 'g': '250', 'maxrate': bitrate, 'bufsize': f"{int(bitrate.replace('k', '')) * 2}k"})
+            # Analysis depth (subq/trellis/partitions/me) is the preset's
+            # job; hand-tuned slow values here silently overrode the
+            # configured preset. A 120-frame keyframe cap also keeps
+            # seeking in players responsive.
+            options.update({'c:v': 'libx264', 'crf': str(crf), 'preset': self.config.video_preset, 'profile:v': 'high', 'level': '4.1', 'tune': 'fastdecode', 'g': '120', 'keyint_min': '24', 'maxrate': bitrate, 'bufsize': f"{int(bitrate.replace('k', '')) * 2}k"})
+            asm_override = self._detect_x264_asm()
+            if asm_override:
+                options['x264-params'] = f"asm={asm_override}"
+
+    def _detect_x264_asm(self) -> Optional[str]:
+        """
+        Return an x264 asm override for CPUs where autodetection misfires.
+
+        Zen 1/Zen 2 (AMD family 23) implement AVX2 by splitting 256-bit ops
+        into two 128-bit halves, so x264's AVX2 kernels run slower there
+        than the SSE4 ones it would otherwise skip.
+
+        Returns:
+            Optional[str]: Comma-separated asm list, or None to leave
+            x264's own detection alone.
+        """
+        try:
+            with open('/proc/cpuinfo') as f:
+                cpuinfo = f.read()
+            if 'AuthenticAMD' in cpuinfo and re.search(r'^cpu family\s*:\s*23$', cpuinfo, re.MULTILINE):
+                return 'mmx2,sse2,ssse3,sse4,avx'
+        except OSError:
+            pass
+        return None
 
     def _configure_audio_options(self, options, audio_stream, duration, is_voice_hint):
         audio_bitrate = self._calculate_audio_bitrate(audio_stream.get('bit_rate'), audio_stream.get('channels', 2))
@@ -655,18 +1115,19 @@ class MediaProcessor:
         """
         Asynchronously optimizes an audio file by running the sync version in a separate thread.
         """
-        await asyncio.to_thread(self._sync_optimize_audio, input_path, output_path)
+        async with self._ffmpeg_semaphore:
+            await asyncio.to_thread(self._sync_optimize_audio, input_path, output_path)
 
     def _sync_optimize_audio(self, input_path: Path, output_path: Path):
         """
         Synchronously optimizes an audio file using ffmpeg. This is a blocking function.
         """
         try:
-            probe = ffmpeg.probe(str(input_path))
+            probe = self._probe_media(input_path)
             audio_stream = next((s for s in probe['streams'] if s['codec_type'] == 'audio'), None)
             if not audio_stream:
                 logger.warning(f"No audio stream in {input_path.name}, copying directly.")
-                ffmpeg.input(str(input_path)).output(str(output_path), c='copy').global_args('-hide_banner', '-loglevel', 'fatal', '-nostats').run(capture_stderr=True, overwrite_output=True)
+                shutil.copyfile(input_path, output_path)
                 return
 
             channels = int(audio_stream.get('channels', 2))
@@ -717,8 +1178,9 @@ class MediaProcessor:
             stderr = e.stderr.decode('utf-8', errors='ignore') if e.stderr else "No stderr"
             logger.error(f"ffmpeg failed for audio {input_path.name}: {stderr}")
             try:
-                # Fallback to simple copy if optimization fails
-                shutil.copy2(input_path, output_path)
+                # Fallback to simple copy if optimization fails;
+                # copyfile skips the extra metadata syscalls of copy2.
+                shutil.copyfile(input_path, output_path)
             except Exception as copy_err:
                 logger.error(f"Audio optimization and fallback copy failed for {input_path.name}: {copy_err}")
         except Exception as e:
@@ -41,6 +41,19 @@ class NoteGenerator:
         self.config = config
         self.file_locks: Dict[Path, asyncio.Lock] = {}
         self.io_semaphore = asyncio.Semaphore(20)
+        self._created_dirs: set = set()
+
+    async def _ensure_dir_once(self, path: Path):
+        """
+        Create a directory once per run, skipping the filesystem call on repeats.
+
+        Args:
+            path (Path): Directory to create.
+        """
+        if path in self._created_dirs:
+            return
+        await asyncio.to_thread(ensure_dir_exists, path)
+        self._created_dirs.add(path)
 
     async def create_note(
         self,
@@ -72,11 +85,11 @@ class NoteGenerator:
             if not note_path:
                 return None
 
-            content = await self._generate_note_content(message, media_paths, note_path)
+            content = self._generate_note_content(message, media_paths, note_path)
 
             if export_comments and client is not None:
                 media_dir = entity_export_path / "media"
-                ensure_dir_exists(media_dir)
+                await self._ensure_dir_once(media_dir)
 
                 media_processor = MediaProcessor(self.config, client)
                 comments_md = await self.export_comments_md(
@@ -137,7 +150,7 @@ class NoteGenerator:
         filename = f"{date_str}.{sanitized_title}.md"
 
         telegraph_dir = notes_export_path / 'telegra_ph'
-        ensure_dir_exists(telegraph_dir)
+        await self._ensure_dir_once(telegraph_dir)
         note_path = telegraph_dir / filename
 
         if telegraph_mapping is not None:
@@ -353,14 +366,14 @@ class NoteGenerator:
 
             year_dir = entity_export_path / str(message_date.year)
             note_path = year_dir / filename
-            ensure_dir_exists(note_path.parent)
+            await self._ensure_dir_once(note_path.parent)
             return note_path
         except Exception as e:
             logger.error(f"Failed to prepare note path for message in entity {entity_id}: {e}", exc_info=True)
             return None
 
-    async def _generate_note_content(self, message: Message, media_paths: List[Path],
-                                     note_path: Path) -> str:
+    def _generate_note_content(self, message: Message, media_paths: List[Path],
+                               note_path: Path) -> str:
         """
         Generate the content for a note.
 
@@ -375,12 +388,12 @@ class NoteGenerator:
         message_text = getattr(message, 'text', '') or ""
         content = message_text.strip() + "\n\n" if message_text else ""
         if media_paths:
-            media_links = await self._generate_media_links(media_paths, note_path)
+            media_links = self._generate_media_links(media_paths, note_path)
             if media_links:
                 content += "\n".join(media_links) + "\n\n"
         return content.strip()
 
-    async def _generate_media_links(self, media_paths: List[Path], note_path: Path) -> List[str]:
+    def _generate_media_links(self, media_paths: List[Path], note_path: Path) -> List[str]:
         """
         Generate markdown links for media files.
 
@@ -413,10 +426,13 @@ class NoteGenerator:
         if note_path not in self.file_locks:
             self.file_locks[note_path] = asyncio.Lock()
 
+        if not content.endswith('\n'):
+            content = content.rstrip() + '\n'
+
         async with self.io_semaphore, self.file_locks[note_path]:
             try:
                 async with aiofiles.open(note_path, 'w', encoding='utf-8') as f:
-                    await f.write(content.strip() + '\n')
+                    await f.write(content)
                 return note_path
             except Exception as e:
                 logger.error(f"Failed to write note file {note_path}: {e}", exc_info=True)
@@ -457,7 +473,7 @@ class NoteGenerator:
             if data and (fname := data.get("filename")):
                 title = data.get("title", "").replace("\n", " ").strip()
                 display = title if title else link_text
-                logger.debug(f"Found link '{url}' -> {fname}")
+                logger.debug("Found link '{}' -> {}", url, fname)
                 return f"[[{Path(fname).stem}|{display}]]"
             rprint(f"[yellow]No local file found for link: '{url}'[/yellow]")
             return match.group(0)
@@ -4,6 +4,7 @@ from pathlib import Path
 from typing import Dict, List, Optional, Set, Tuple, Union
 
 import aiofiles
+import aiofiles.os
 
 from src.cache_manager import CacheManager
 from src.config import Config
@@ -216,14 +217,14 @@ class ReplyLinker:
             Optional[Path]: The path to the note file if found, otherwise None.
         """
         note_path = base_path / filename
-        if note_path.exists():
+        if await aiofiles.os.path.exists(note_path):
             return note_path
 
         try:
             year = filename.split('-')[0]
             if year.isdigit() and len(year) == 4:
                 year_path = base_path / year / filename
-                if year_path.exists():
+                if await aiofiles.os.path.exists(year_path):
                     return year_path
         except Exception:
             pass
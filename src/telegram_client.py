@@ -1,6 +1,7 @@
 import asyncio
 import re
 import sys
+from collections import OrderedDict
 from pathlib import Path
 from typing import Any, AsyncGenerator, Dict, Optional, Union
 
@@ -17,12 +18,25 @@ from telethon.errors import (
     UsernameNotOccupiedError,
     UserNotParticipantError,
 )
+from telethon.tl.functions.channels import GetChannelsRequest
+from telethon.tl.functions.users import GetUsersRequest
 from telethon.tl.types import Message
 
 from src.config import Config, ExportTarget
 from src.exceptions import TelegramConnectionError
 from src.utils import clear_screen, logger, notify_and_pause
 
+# Upper bound for the in-memory entity cache; Telethon's session file
+# already persists resolved entities across runs.
+ENTITY_CACHE_MAX_ENTRIES = 1024
+
+# Display names for the concrete entity classes Telethon returns.
+_ENTITY_TYPE_NAMES = {
+    types.User: "User",
+    types.Chat: "Group",
+    types.Channel: "Channel",
+}
+
 
 async def notify_and_pause_async(text):
     """
@@ -66,7 +80,7 @@ class TelegramManager:
             connection_retries=5, retry_delay=2, request_retries=5,
             proxy=proxy_info
         )
-        self.entity_cache: Dict[str, Any] = {}
+        self.entity_cache: OrderedDict = OrderedDict()
         self.client_connected = False
 
     async def connect(self) -> bool:
@@ -148,6 +162,26 @@ class TelegramManager:
             logger.error(f"Error disconnecting Telegram client: {e}")
             return False
 
+    @staticmethod
+    def _normalize_entity_key(entity_identifier: Union[str, int]) -> str:
+        """
+        Normalize an entity identifier into a cache key.
+
+        '@channel', 'Channel' and 't.me/channel' all resolve to the same
+        entity, so they should hit the same cache slot.
+
+        Args:
+            entity_identifier (str|int): The identifier of the entity.
+
+        Returns:
+            str: The normalized cache key.
+        """
+        key = str(entity_identifier).strip()
+        link_match = re.match(r"^https?://t\.me/([\w\d_]+)/?$", key)
+        if link_match:
+            key = link_match.group(1)
+        return key.lstrip('@').lower()
+
     async def resolve_entity(self, entity_identifier: Union[str, int]) -> Optional[Any]:
         """
         Resolve a Telegram entity by its identifier.
@@ -161,14 +195,16 @@ class TelegramManager:
         entity_id_str = str(entity_identifier).strip()
         if not entity_id_str:
             return None
-        if entity_id_str in self.entity_cache:
-            return self.entity_cache[entity_id_str]
+        cache_key = self._normalize_entity_key(entity_id_str)
+        if cache_key in self.entity_cache:
+            self.entity_cache.move_to_end(cache_key)
+            return self.entity_cache[cache_key]
 
         for attempt in range(1, 3):
             try:
                 entity = await self._get_entity(entity_id_str)
                 if entity:
-                    self.entity_cache[entity_id_str] = entity
+                    self._cache_entity(cache_key, entity)
                     return entity
             except FloodWaitError as e:
                 logger.warning(f"Flood wait: {e.seconds}s. Waiting...")
@@ -183,6 +219,81 @@ class TelegramManager:
         logger.error(f"Failed to resolve '{entity_id_str}' after multiple attempts.")
         return None
 
+    def _cache_entity(self, cache_key: str, entity: Any):
+        """
+        Store a resolved entity in the LRU cache, evicting the oldest entry.
+
+        Args:
+            cache_key (str): Normalized cache key.
+            entity (Any): The resolved entity.
+        """
+        self.entity_cache[cache_key] = entity
+        if len(self.entity_cache) > ENTITY_CACHE_MAX_ENTRIES:
+            self.entity_cache.popitem(last=False)
+
+    async def resolve_entities(self, identifiers) -> Dict[str, Optional[Any]]:
+        """
+        Resolve several entity identifiers, batching numeric IDs.
+
+        Numeric user and channel IDs are fetched up to 100 per request via
+        GetUsersRequest/GetChannelsRequest; usernames and links go through
+        resolve_entity one by one. Any batch failure falls back to per-id
+        resolution, so this never resolves fewer entities than a loop over
+        resolve_entity would.
+
+        Args:
+            identifiers: Iterable of entity identifiers (IDs, usernames, links).
+
+        Returns:
+            Dict[str, Optional[Any]]: Resolved entity (or None) per identifier.
+        """
+        results: Dict[str, Optional[Any]] = {}
+        user_ids, channel_ids, other_ids = [], [], []
+        for identifier in identifiers:
+            id_str = str(identifier).strip()
+            if not id_str:
+                continue
+            cache_key = self._normalize_entity_key(id_str)
+            if cache_key in self.entity_cache:
+                self.entity_cache.move_to_end(cache_key)
+                results[id_str] = self.entity_cache[cache_key]
+            elif id_str.startswith('-100') and id_str[4:].isdigit():
+                channel_ids.append(id_str)
+            elif id_str.lstrip('-').isdigit():
+                user_ids.append(id_str)
+            else:
+                other_ids.append(id_str)
+
+        async def resolve_chunk_batched(chunk, request_cls):
+            inputs = [await self.client.get_input_entity(int(id_str)) for id_str in chunk]
+            response = await self.client(request_cls(inputs))
+            entities = response.chats if hasattr(response, 'chats') else response
+            by_bare_id = {entity.id: entity for entity in entities}
+            for id_str in chunk:
+                bare_id = int(id_str[4:]) if id_str.startswith('-100') else int(id_str)
+                entity = by_bare_id.get(bare_id)
+                if entity:
+                    self._cache_entity(self._normalize_entity_key(id_str), entity)
+                results[id_str] = entity
+
+        async def resolve_chunk_individually(chunk):
+            resolved = await asyncio.gather(*(self.resolve_entity(id_str) for id_str in chunk))
+            for id_str, entity in zip(chunk, resolved):
+                results[id_str] = entity
+
+        for ids, request_cls in ((user_ids, GetUsersRequest), (channel_ids, GetChannelsRequest)):
+            for start in range(0, len(ids), 100):
+                chunk = ids[start:start + 100]
+                try:
+                    await resolve_chunk_batched(chunk, request_cls)
+                except Exception as e:
+                    logger.debug(f"Batched entity resolution failed ({e}), resolving individually.")
+                    await resolve_chunk_individually(chunk)
+
+        if other_ids:
+            await resolve_chunk_individually(other_ids)
+        return results
+
     async def _get_entity(self, entity_id_str: str) -> Optional[Any]:
         """
         Get a Telegram entity by its string identifier.
@@ -215,11 +326,56 @@ class TelegramManager:
         if min_id:
             logger.info(f"Starting from message ID: {min_id}")
 
-        async for message in self.client.iter_messages(
-            entity=entity, limit=limit, offset_id=0, reverse=True,
-            min_id=min_id or 0, wait_time=self.config.request_delay):
-            if isinstance(message, Message) and not message.action:
-                yield message
+        queue: asyncio.Queue = asyncio.Queue(maxsize=256)
+
+        async def producer():
+            try:
+                async for message in self.client.iter_messages(
+                    entity=entity, limit=limit, offset_id=0, reverse=True,
+                    min_id=min_id or 0, wait_time=self.config.request_delay):
+                    # Exact type check: iter_messages yields Message or
+                    # MessageService, never subclasses, and type() is
+                    # cheaper than isinstance on this hot path.
+                    if type(message) is Message and message.action is None:
+                        await queue.put(message)
+            except Exception as e:
+                await queue.put(e)
+            else:
+                await queue.put(None)
+
+        # Prefetch the next API batch in the background so consumers never
+        # sit idle on the iter_messages round-trip.
+        producer_task = asyncio.create_task(producer())
+        try:
+            while True:
+                item = await queue.get()
+                if item is None:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            producer_task.cancel()
+
+    async def count_messages(self, entity: Any) -> Optional[int]:
+        """
+        Return the total message count of an entity in a single request.
+
+        Uses get_messages(limit=0), which only asks the server for the
+        counter and transfers no messages.
+
+        Args:
+            entity (Any): The Telegram entity to count messages for.
+
+        Returns:
+            Optional[int]: The total message count, or None on failure.
+        """
+        try:
+            result = await self.client.get_messages(entity, limit=0)
+            return result.total
+        except Exception as e:
+            logger.warning(f"Could not get message count: {e}")
+            return None
 
     def _display_menu(self):
         """
@@ -395,13 +551,7 @@ class TelegramManager:
         Returns:
             str: The type name of the entity.
         """
-        if isinstance(entity, types.User):
-            return "User"
-        if isinstance(entity, types.Chat):
-            return "Group"
-        if isinstance(entity, types.Channel):
-            return "Channel"
-        return type(entity).__name__
+        return _ENTITY_TYPE_NAMES.get(type(entity), type(entity).__name__)
 
     async def _process_dialog_selection(self, selection: str, dialog_map: Dict[int, Any]) -> bool:
         """
@@ -93,6 +93,12 @@ def setup_logging(log_level: str = "INFO"):
     logging.getLogger('telethon').setLevel(logging.WARNING)
     logging.getLogger('PIL').setLevel(logging.WARNING)
 
+_INVALID_FILENAME_CHARS_RE = re.compile(r'[\\/*?:"<>|&!]')
+
+_RESERVED_FILENAMES = {"CON", "PRN", "AUX", "NUL", "COM1", "COM2", "COM3", "COM4", "COM5",
+                       "COM6", "COM7", "COM8", "COM9", "LPT1", "LPT2", "LPT3", "LPT4",
+                       "LPT5", "LPT6", "LPT7", "LPT8", "LPT9"}
+
 def sanitize_filename(text: str, max_length: int = 200, replacement: str = '') -> str:
     """
     Sanitizes a filename for safe use on all platforms.
@@ -107,12 +113,9 @@ def sanitize_filename(text: str, max_length: int = 200, replacement: str = '') -
     """
     if not text:
         return "Untitled"
-    text = re.sub(r'[\\/*?:"<>|&!]', replacement, text)
+    text = _INVALID_FILENAME_CHARS_RE.sub(replacement, text)
     text = text.strip('. ')
-    reserved_names = {"CON", "PRN", "AUX", "NUL", "COM1", "COM2", "COM3", "COM4", "COM5",
-                      "COM6", "COM7", "COM8", "COM9", "LPT1", "LPT2", "LPT3", "LPT4",
-                      "LPT5", "LPT6", "LPT7", "LPT8", "LPT9"}
-    if text.upper() in reserved_names:
+    if text.upper() in _RESERVED_FILENAMES:
         text = f"{text}_file"
     if len(text) > max_length:
         cutoff = text[:max_length].rfind(' ')
@@ -224,7 +227,7 @@ async def fetch_and_parse_telegraph_to_markdown(
         Optional[Dict[str, Any]]: A dictionary with 'title', 'content', and 'pub_date' keys, or None on failure.
     """
     try:
-        logger.debug(f"Fetching Telegra.ph article: {url}")
+        logger.debug("Fetching Telegra.ph article: {}", url)
         async with session.get(url, timeout=30) as response:
             response.raise_for_status()
             html = await response.text()
@@ -320,7 +323,7 @@ async def fetch_and_parse_telegraph_to_markdown(
                 if data and (fname := data.get("filename")):
                     title_text = data.get("title", "").replace("\n", " ").strip()
                     display = title_text if title_text else link_text
-                    logger.debug(f"Found link in Telegra.ph '{tg_url}' -> {fname}")
+                    logger.debug("Found link in Telegra.ph '{}' -> {}", tg_url, fname)
                     return f"[[{Path(fname).stem}|{display}]]"
 
                 logger.warning(f"[Telegra.ph Parser] No local file found for link: '{tg_url}'")
@@ -343,7 +346,7 @@ async def fetch_and_parse_telegraph_to_markdown(
                 link_text, telegraph_url = match.groups()
                 telegraph_url = telegraph_url.rstrip('/')
                 if (note_stem := telegraph_mapping.get(telegraph_url)):
-                    logger.debug(f"Replacing telegra.ph link '{telegraph_url}' with local note [[{note_stem}]]")
+                    logger.debug("Replacing telegra.ph link '{}' with local note [[{}]]", telegraph_url, note_stem)
                     return f"[[{note_stem}|{link_text}]]"
                 return match.group(0)
 